@@ -16,30 +16,32 @@ class ORMBGProcessor:
         self.net.to(self.device)
 
     def process_image(self, image):
-        # Ensure image is in RGB mode
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-
-        # Preprocess the image
-        w, h = image.size
-        image = image.resize((1024, 1024), Image.BILINEAR)
-        im_np = np.array(image)
-        im_tensor = torch.tensor(im_np, dtype=torch.float32).permute(2, 0, 1).unsqueeze(0)
+        return self.process_images([image])[0]
+
+    def process_images(self, images):
+        # Ensure images are in RGB mode
+        images = [image if image.mode == "RGB" else image.convert("RGB") for image in images]
+
+        # Preprocess the images as a single batch
+        w, h = images[0].size
+        im_np = np.stack([np.array(image.resize((1024, 1024), Image.BILINEAR)) for image in images])
+        im_tensor = torch.tensor(im_np, dtype=torch.float32).permute(0, 3, 1, 2)
         im_tensor = torch.divide(im_tensor, 255.0).to(self.device)
 
-        # Inference
-        with torch.no_grad():
+        # Inference, in half precision on the GPU
+        use_fp16 = self.device.type == "cuda"
+        with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16, enabled=use_fp16):
             result = self.net(im_tensor)
 
         # Post-process
-        result = result[0][0]  # Take the first element of the output list and the first channel
+        result = result[0][0].float()  # Take the first element of the output list and the first channel
         result = F.interpolate(result, size=(h, w), mode="bilinear")
-        result = result.squeeze()
-        result = (result - result.min()) / (result.max() - result.min())
-        
-        # Create mask and apply to original image
-        mask = Image.fromarray((result.cpu().numpy() * 255).astype(np.uint8))
-        new_im = Image.new("RGBA", (w, h), (0, 0, 0, 0))
-        new_im.paste(image.resize((w, h), Image.BILINEAR), mask=mask)
-
-        return new_im
\ No newline at end of file
+        result = result[:, 0]
+        mi = result.amin(dim=(1, 2), keepdim=True)
+        ma = result.amax(dim=(1, 2), keepdim=True)
+        result = (result - mi) / (ma - mi)
+        masks = (result * 255).to(torch.uint8).cpu().numpy()
+
+        # Use the masks as the alpha channel of the original images
+        return [Image.fromarray(np.dstack([np.asarray(image, dtype=np.uint8), mask]), "RGBA")
+                for image, mask in zip(images, masks)]
\ No newline at end of file
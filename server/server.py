@@ -1,8 +1,11 @@
-from fastapi import FastAPI, UploadFile, File, Response, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Response, Form, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from PIL import Image
 import io
+import heapq
+import json
+from fractions import Fraction
 import shutil
 from rembg import remove as rembg_remove, new_session
 import time
@@ -15,11 +18,16 @@ from transformers import pipeline
 from transparent_background import Remover
 import logging
 import asyncio
-from datetime import datetime, timedelta
 import torch
+import torch.nn.functional as F
 from ormbg import ORMBGProcessor 
+import onnxruntime as ort
 from typing import Dict
 from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import numba
+from cachetools import TLRUCache
 
 from carvekit.ml.files.models_loc import download_all
 
@@ -35,6 +43,11 @@ from carvekit.pipelines.postprocessing import MattingMethod
 from carvekit.pipelines.preprocessing import PreprocessingStub
 from carvekit.trimap.generator import TrimapGenerator
 
+try:
+    from trt_runner import TRTRunner
+except ImportError:
+    TRTRunner = None
+
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -59,12 +72,64 @@ app = FastAPI()
 TEMP_VIDEOS_DIR = "temp_videos"
 os.makedirs(TEMP_VIDEOS_DIR, exist_ok=True)
 
-# Create a frames directory within temp_videos
-FRAMES_DIR = os.path.join(TEMP_VIDEOS_DIR, "frames")
-os.makedirs(FRAMES_DIR, exist_ok=True)
+# Shared pool for CPU-bound image decode/encode that runs beside the GPU
+cpu_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+# Chunk size used when copying uploaded videos to disk
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Read-ahead buffer for raw frames coming out of the ffmpeg decoder
+FFMPEG_PIPE_BUFSIZE = 1 << 20
+
+# Hardware decoder passed to ffmpeg's -hwaccel, empty to decode on the CPU. 'auto' falls back to
+# software decoding where the GPU has no usable decoder (ROCm builds, containers without NVDEC)
+FFMPEG_HWACCEL = os.getenv('FFMPEG_HWACCEL', 'auto' if torch.cuda.is_available() else '')
+FFMPEG_THREADS = int(os.getenv('FFMPEG_THREADS', str(os.cpu_count() or 4)))
+
+# WebM encoder settings, picked with VIDEO_ENCODE_PRESET; all of them keep the alpha channel
+VIDEO_ENCODE_PRESETS = {
+    # Threaded constant-quality VP9
+    'quality': ['-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', '20', '-deadline', 'good', '-cpu-used', '4',
+                '-row-mt', '1', '-tile-columns', '2'],
+    # Fastest VP9 for quick previews
+    'preview': ['-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', '30', '-deadline', 'realtime', '-cpu-used', '8',
+                '-row-mt', '1', '-tile-columns', '2'],
+    # VP8 has native alpha support and encodes faster than VP9
+    'vp8': ['-c:v', 'libvpx', '-b:v', '4M', '-crf', '10', '-auto-alt-ref', '0', '-deadline', 'good',
+            '-cpu-used', '4'],
+}
+VIDEO_ENCODE_PRESET = os.getenv('VIDEO_ENCODE_PRESET', 'quality')
+if VIDEO_ENCODE_PRESET not in VIDEO_ENCODE_PRESETS:
+    raise ValueError(f"Unknown VIDEO_ENCODE_PRESET '{VIDEO_ENCODE_PRESET}', "
+                     f"valid presets are: {', '.join(VIDEO_ENCODE_PRESETS)}")
+
+def status_expiry(video_id, status, now):
+    # Queued and running jobs can go a long time between updates, so only finished ones expire
+    if status['status'] in ('completed', 'error'):
+        return now + 3600
+    return float('inf')
+
+# Processing status per video, entries expire an hour after the job completes or fails
+processing_status = TLRUCache(maxsize=10000, ttu=status_expiry)
+status_lock = asyncio.Lock()
+
+# Temp files are deleted this many seconds after they are created
+TEMP_FILE_TTL = 600
+
+# Pending deletions as a min-heap of (expiry timestamp, path)
+cleanup_heap = []
+cleanup_wakeup = asyncio.Event()
+
+# Number of video frames pushed through a model in a single forward pass
+VIDEO_BATCH_SIZE = int(os.getenv('VIDEO_BATCH_SIZE', '8'))
 
-# Add a dictionary to store processing status
-processing_status = {}
+# TensorRT FP16 engines are used whenever TensorRT is installed and a GPU is present
+USE_TENSORRT = os.getenv('USE_TENSORRT', '1') == '1' and TRTRunner is not None and torch.cuda.is_available()
+TENSORRT_CACHE_DIR = os.getenv('TENSORRT_CACHE_DIR', os.path.expanduser("~/.cache/bgbye/tensorrt"))
+
+# torch.compile is the fallback for InSPyReNet when no TensorRT engine is available
+USE_TORCH_COMPILE = os.getenv('USE_TORCH_COMPILE', '1') == '1' and torch.cuda.is_available()
+os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', os.path.expanduser("~/.cache/bgbye/inductor"))
 
 # Add CORS middleware
 app.add_middleware(
@@ -75,31 +140,124 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def schedule_cleanup(path, delay=TEMP_FILE_TTL):
+    heapq.heappush(cleanup_heap, (time.time() + delay, path))
+    cleanup_wakeup.set()
+
 async def cleanup_old_videos():
+    # Pick up whatever a previous run left behind, based on its modification time
+    for item in os.listdir(TEMP_VIDEOS_DIR):
+        item_path = os.path.join(TEMP_VIDEOS_DIR, item)
+        try:
+            schedule_cleanup(item_path, max(0, os.path.getmtime(item_path) + TEMP_FILE_TTL - time.time()))
+        except OSError as e:
+            logger.warning(f"Could not schedule cleanup of {item_path}: {e}")
+
     while True:
-        current_time = datetime.now()
-        for item in os.listdir(TEMP_VIDEOS_DIR):
-            item_path = os.path.join(TEMP_VIDEOS_DIR, item)
-            item_modified = datetime.fromtimestamp(os.path.getmtime(item_path))
-            if current_time - item_modified > timedelta(minutes=10):
-                if os.path.isfile(item_path):
-                    os.remove(item_path)
-                    logger.info(f"Removed old file: {item_path}")
-                elif os.path.isdir(item_path):
-                    shutil.rmtree(item_path)
-                    logger.info(f"Removed old directory: {item_path}")
-        await asyncio.sleep(600)  # Run every 10 minutes
+        if not cleanup_heap:
+            cleanup_wakeup.clear()
+            await cleanup_wakeup.wait()
+            continue
+
+        # Every path gets the same TTL, so nothing scheduled later can expire before the head
+        expiry, item_path = cleanup_heap[0]
+        await asyncio.sleep(max(0, expiry - time.time()))
+        heapq.heappop(cleanup_heap)
+
+        # A single failed deletion must not stop the loop, or nothing would be cleaned up again
+        try:
+            if os.path.isfile(item_path):
+                os.remove(item_path)
+                logger.info(f"Removed old file: {item_path}")
+            elif os.path.isdir(item_path):
+                shutil.rmtree(item_path)
+                logger.info(f"Removed old directory: {item_path}")
+        except OSError as e:
+            logger.error(f"Failed to remove {item_path}: {e}")
+
+# Models that stay resident run on the GPU when one is available
+inference_device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+# Half precision for GPU inference, AUTOCAST_DTYPE=float32 keeps full precision
+AUTOCAST_DTYPES = {'float16': torch.float16, 'bfloat16': torch.bfloat16, 'float32': torch.float32}
+autocast_dtype_name = os.getenv('AUTOCAST_DTYPE', 'float16')
+if autocast_dtype_name not in AUTOCAST_DTYPES:
+    raise ValueError(f"Unknown AUTOCAST_DTYPE '{autocast_dtype_name}', "
+                     f"valid dtypes are: {', '.join(AUTOCAST_DTYPES)}")
+AUTOCAST_DTYPE = AUTOCAST_DTYPES[autocast_dtype_name]
+
+def inference_autocast():
+    enabled = inference_device == 'cuda' and AUTOCAST_DTYPE != torch.float32
+    return torch.autocast('cuda', dtype=AUTOCAST_DTYPE, enabled=enabled)
 
 # Pre-load all models
 bria_model = pipeline("image-segmentation", model="briaai/RMBG-1.4", trust_remote_code=True, device="cpu")
-inspyrenet_model = Remover()
-inspyrenet_model.model.cpu()
-rembg_models = {
-    'u2net': new_session('u2net'),
-    'u2net_human_seg': new_session('u2net_human_seg'),
-    'isnet-general-use': new_session('isnet-general-use'),
-    'isnet-anime': new_session('isnet-anime')
-}
+inspyrenet_model = Remover(device=inference_device)
+
+# Fixed InSPyReNet input canvases for video, what the Remover transform produces for landscape
+# and portrait 720p frames. Frames are scaled to fit the canvas for their orientation and padded,
+# so the TensorRT engine and compiled graph only ever see these shapes.
+inspyrenet_landscape_canvas = tuple(inspyrenet_model.transform(Image.new('RGB', (1280, 720))).shape)
+inspyrenet_portrait_canvas = tuple(inspyrenet_model.transform(Image.new('RGB', (720, 1280))).shape)
+
+def inspyrenet_canvas(width, height):
+    return inspyrenet_portrait_canvas if height > width else inspyrenet_landscape_canvas
+
+def build_inspyrenet_engine():
+    _, h, w = inspyrenet_landscape_canvas
+    # Square maximum so the portrait canvas fits the same profile
+    max_side = max(1280, h, w)
+    return TRTRunner.from_model(
+        inspyrenet_model.model, 'inspyrenet', TENSORRT_CACHE_DIR,
+        min_shape=(1, 3, 256, 256),
+        opt_shape=(VIDEO_BATCH_SIZE, 3, h, w),
+        max_shape=(VIDEO_BATCH_SIZE, 3, max_side, max_side),
+    )
+
+inspyrenet_engine = None
+if USE_TENSORRT:
+    try:
+        inspyrenet_engine = build_inspyrenet_engine()
+    except Exception:
+        logger.exception("Failed to build TensorRT engine for InSPyReNet, falling back to PyTorch")
+
+# Single images run eagerly at their own input size, only video frames use the compiled graph
+inspyrenet_eager_model = inspyrenet_model.model
+
+def compile_inspyrenet():
+    inspyrenet_model.model = torch.compile(inspyrenet_eager_model, mode="max-autotune", dynamic=False, fullgraph=True)
+    try:
+        # Compile now for single frames and full video batches on both canvases rather than on the first video
+        with torch.inference_mode(), inference_autocast():
+            for canvas in {inspyrenet_landscape_canvas, inspyrenet_portrait_canvas}:
+                for batch_size in (1, VIDEO_BATCH_SIZE):
+                    inspyrenet_model.model(torch.zeros((batch_size, *canvas), device=inference_device))
+    except Exception:
+        inspyrenet_model.model = inspyrenet_eager_model
+        raise
+
+inspyrenet_compiled = False
+if inspyrenet_engine is None and USE_TORCH_COMPILE:
+    try:
+        compile_inspyrenet()
+        inspyrenet_compiled = True
+    except Exception:
+        logger.exception("Failed to compile InSPyReNet, falling back to eager mode")
+
+def rembg_providers():
+    if not USE_TENSORRT or 'TensorrtExecutionProvider' not in ort.get_available_providers():
+        return None
+    # rembg only keeps provider names it finds in get_available_providers(), so the
+    # TensorRT options go through the environment variables onnxruntime reads instead
+    os.environ.setdefault('ORT_TENSORRT_FP16_ENABLE', '1')
+    os.environ.setdefault('ORT_TENSORRT_ENGINE_CACHE_ENABLE', '1')
+    os.environ.setdefault('ORT_TENSORRT_CACHE_PATH', TENSORRT_CACHE_DIR)
+    return ['TensorrtExecutionProvider', 'CUDAExecutionProvider', 'CPUExecutionProvider']
+
+# rembg sessions are only created the first time a model is requested
+@lru_cache(maxsize=4)
+def get_rembg_session(model):
+    return new_session(model, providers=rembg_providers())
 
 # Initialize Carvekit models
 def initialize_carvekit_model(seg_pipe_class, device='cuda'):
@@ -125,24 +283,230 @@ carvekit_models = {
 # Ensure GPU memory is cleared after initialization
 torch.cuda.empty_cache()
 
-def process_with_bria(image):
-    result = bria_model(image, return_mask=True)
-    mask = result
-    if not isinstance(mask, Image.Image):
-        mask = Image.fromarray((mask * 255).astype('uint8'))
-    no_bg_image = Image.new("RGBA", image.size, (0, 0, 0, 0))
-    no_bg_image.paste(image, mask=mask)
-    return no_bg_image
+# Input size used by the BRIA RMBG-1.4 pipeline
+BRIA_INPUT_SIZE = (1024, 1024)
 
-def process_with_ormbg(image):
-    result = ormbg_processor.process_image(image)
-    return result
+# (mean, std, size) each rembg session uses in its own predict()
+REMBG_INPUT_SPECS = {
+    'u2net': ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    'u2net_human_seg': ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    'isnet-general-use': ((0.485, 0.456, 0.406), (1.0, 1.0, 1.0), (1024, 1024)),
+    'isnet-anime': ((0.485, 0.456, 0.406), (1.0, 1.0, 1.0), (1024, 1024)),
+}
 
-def process_with_inspyrenet(image):
-    return inspyrenet_model.process(image, type='rgba')
+# ImageNet statistics the Remover transform normalizes with
+INSPYRENET_MEAN = torch.tensor([0.485, 0.456, 0.406], device=inference_device).view(1, 3, 1, 1)
+INSPYRENET_STD = torch.tensor([0.229, 0.224, 0.225], device=inference_device).view(1, 3, 1, 1)
+
+@numba.njit(parallel=True, cache=True)
+def normalize_masks(preds):
+    # Per-mask min-max scaling, clamping and uint8 cast fused into a single pass
+    n, h, w = preds.shape
+    masks = np.empty((n, h, w), dtype=np.uint8)
+    for b in range(n):
+        lo = preds[b].min()
+        hi = preds[b].max()
+        scale = 255.0 / (hi - lo) if hi > lo else 0.0
+        for y in numba.prange(h):
+            for x in range(w):
+                masks[b, y, x] = min(max((preds[b, y, x] - lo) * scale, 0.0), 255.0)
+    return masks
+
+# Compile the kernel at startup instead of on the first request
+normalize_masks(np.zeros((1, 8, 8), dtype=np.float32))
+
+def compose_rgba(frames, masks):
+    # A single (N, H, W, 4) buffer for the whole batch rather than an allocation per frame
+    rgba = np.empty((*masks.shape, 4), dtype=np.uint8)
+    rgba[..., :3] = frames
+    rgba[..., 3] = masks
+    return rgba
+
+def resize_batch(frames, size, device, antialias=True):
+    # Frames go from the decoded size to the fixed network input size in one batched resize
+    x = torch.from_numpy(frames).to(device).permute(0, 3, 1, 2).float()
+    return F.interpolate(x, size=size, mode='bilinear', antialias=antialias)
+
+def upsample_masks(masks, size):
+    # Network-resolution masks are scaled back to the frame size only at composite time
+    return F.interpolate(masks, size=size, mode='bilinear')
+
+def process_with_bria(frames):
+    h, w = frames[0].shape[:2]
+    frames = np.stack(frames)
+    # BRIA's own preprocessing resizes without antialiasing
+    x = resize_batch(frames, BRIA_INPUT_SIZE, bria_model.device, antialias=False) / 255.0 - 0.5
+    with torch.no_grad():
+        result = bria_model.model(x)[0][0]
+    result = upsample_masks(result, (h, w))
+    mi = result.amin(dim=(1, 2, 3), keepdim=True)
+    ma = result.amax(dim=(1, 2, 3), keepdim=True)
+    masks = ((result - mi) / (ma - mi) * 255).to(torch.uint8)[:, 0].cpu().numpy()
+    return compose_rgba(frames, masks)
+
+def process_with_ormbg(images):
+    return ormbg_processor.process_images(images)
+
+class PinnedUploader:
+    """Moves uint8 frame and mask batches between host and GPU through reusable pinned buffers."""
+
+    def __init__(self, slots=2, mask_slots=4):
+        self.copy_stream = torch.cuda.Stream()
+        self.slots = slots
+        self.frame_shape = None
+        self.next_slot = 0
+        # A mask buffer is only read once the writer gets to its batch, which can trail the
+        # GPU by the two queued results plus the batch each of the worker and writer holds
+        self.mask_buffers = [None] * mask_slots
+        self.next_mask_slot = 0
+
+    def upload(self, frames):
+        if frames.shape[1:] != self.frame_shape or len(frames) > len(self.buffers[0]):
+            # Sized to the batch that needs them, so a single large image doesn't pin a whole video batch
+            self.frame_shape = frames.shape[1:]
+            self.buffers = [torch.empty(frames.shape, dtype=torch.uint8, pin_memory=True)
+                            for _ in range(self.slots)]
+            self.copied = [None] * self.slots
+
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % self.slots
+        if self.copied[slot] is not None:
+            # The previous upload out of this buffer has to land before it is overwritten
+            self.copied[slot].synchronize()
+
+        staging = self.buffers[slot][:len(frames)]
+        staging.numpy()[...] = frames
+        with torch.cuda.stream(self.copy_stream):
+            x = staging.to('cuda', non_blocking=True)
+            self.copied[slot] = torch.cuda.Event()
+            self.copied[slot].record(self.copy_stream)
+
+        compute_stream = torch.cuda.current_stream()
+        compute_stream.wait_event(self.copied[slot])
+        # x was allocated on the copy stream but is consumed on the compute stream
+        x.record_stream(compute_stream)
+        return x
+
+    def download(self, masks):
+        slot = self.next_mask_slot
+        self.next_mask_slot = (slot + 1) % len(self.mask_buffers)
+        buffer = self.mask_buffers[slot]
+        if buffer is None or buffer.shape[1:] != masks.shape[1:] or len(buffer) < len(masks):
+            buffer = self.mask_buffers[slot] = torch.empty(masks.shape, dtype=torch.uint8, pin_memory=True)
+
+        # Copy the masks back without blocking, so the next batch can be launched right away
+        host_masks = buffer[:len(masks)]
+        host_masks.copy_(masks, non_blocking=True)
+        ready = torch.cuda.Event()
+        ready.record()
+        return host_masks, ready
+
+class PendingMasks:
+    """Masks for a batch of frames that may still be in flight on the GPU."""
+
+    def __init__(self, frames, masks, ready=None):
+        self.frames = frames
+        self.masks = masks
+        self.ready = ready
+
+    def result(self):
+        if self.ready is not None:
+            self.ready.synchronize()
+        return compose_rgba(self.frames, self.masks.numpy())
+
+def inspyrenet_masks(pred, size):
+    # InSPyReNet min-max scales its output over the whole batch, so each mask is rescaled on
+    # its own to keep padding and neighbouring frames from changing it
+    pred = pred.float()
+    lo = pred.amin(dim=(1, 2, 3), keepdim=True)
+    hi = pred.amax(dim=(1, 2, 3), keepdim=True)
+    pred = (pred - lo) / (hi - lo + 1e-8)
+    pred = F.interpolate(pred, size, mode='bilinear', align_corners=True)
+    return (pred[:, 0].clamp(0, 1) * 255).to(torch.uint8)
+
+def inspyrenet_input(x, size):
+    # uint8 NHWC frames on the device to a normalized NCHW batch at the network input size
+    x = x.permute(0, 3, 1, 2).float() / 255.0
+    x = F.interpolate(x, size=size, mode='bilinear', antialias=True)
+    return (x - INSPYRENET_MEAN) / INSPYRENET_STD
+
+@lru_cache(maxsize=16)
+def inspyrenet_input_size(width, height):
+    # Let the Remover transform decide the network input size for this image size
+    return tuple(inspyrenet_model.transform(Image.new('RGB', (width, height))).shape[1:])
+
+def launch_inspyrenet(frames, uploader=None):
+    h, w = frames[0].shape[:2]
+    frames = np.stack(frames)
+    if uploader is not None:
+        x = uploader.upload(frames)
+    else:
+        x = torch.from_numpy(frames).to(inference_device)
+
+    # Fit the frame inside its canvas and pad the rest, rather than stretching it out of shape.
+    # Zero padding is the mean color once normalized.
+    _, canvas_h, canvas_w = inspyrenet_canvas(w, h)
+    scale = min(canvas_h / h, canvas_w / w)
+    fit_h, fit_w = min(canvas_h, round(h * scale)), min(canvas_w, round(w * scale))
+    x = inspyrenet_input(x, (fit_h, fit_w))
+    x = F.pad(x, (0, canvas_w - fit_w, 0, canvas_h - fit_h))
+
+    pred = None
+    if inspyrenet_engine is not None:
+        try:
+            pred = inspyrenet_engine(x)
+        except RuntimeError:
+            logger.exception("TensorRT inference failed for InSPyReNet, falling back to PyTorch")
+    if pred is None:
+        batch_size = len(frames)
+        if inspyrenet_compiled and batch_size not in (1, VIDEO_BATCH_SIZE):
+            # Pad partial batches to a warmed-up shape so the static graph is not recompiled
+            x = torch.cat([x, x.new_zeros((VIDEO_BATCH_SIZE - batch_size, *x.shape[1:]))])
+        with torch.inference_mode(), inference_autocast():
+            pred = inspyrenet_model.model(x)[:batch_size]
+
+    # Crop the padding off before scaling the mask back to the frame size
+    pred_h, pred_w = pred.shape[2:]
+    pred = pred[:, :, :round(fit_h * pred_h / canvas_h), :round(fit_w * pred_w / canvas_w)]
+    masks = inspyrenet_masks(pred, (h, w))
+
+    if uploader is None:
+        return PendingMasks(frames, masks.cpu())
+    return PendingMasks(frames, *uploader.download(masks))
+
+def process_with_inspyrenet(frames):
+    # Single images keep the input size the Remover transform picks for them, so they run eagerly
+    # instead of through the fixed-shape video engines, and skip the pinned buffers video jobs use
+    h, w = frames[0].shape[:2]
+    frames = np.stack(frames)
+    x = inspyrenet_input(torch.from_numpy(frames).to(inference_device), inspyrenet_input_size(w, h))
+    with torch.inference_mode(), inference_autocast():
+        pred = inspyrenet_eager_model(x)
+    return compose_rgba(frames, inspyrenet_masks(pred, (h, w)).cpu().numpy())
+
+def process_with_rembg(frames, model='u2net'):
+    session = get_rembg_session(model)
+    mean, std, size = REMBG_INPUT_SPECS[model]
+    h, w = frames[0].shape[:2]
+    frames = np.stack(frames)
+
+    # Same preprocessing as the session's own normalize(), done on the whole batch
+    x = resize_batch(frames, size[::-1], inference_device)
+    x = x / x.amax(dim=(1, 2, 3), keepdim=True).clamp(min=1)
+    x = (x - x.new_tensor(mean).view(1, 3, 1, 1)) / x.new_tensor(std).view(1, 3, 1, 1)
+    inputs = x.cpu().numpy()
+
+    # Some of the exported ONNX graphs have a fixed batch dimension of 1
+    model_input = session.inner_session.get_inputs()[0]
+    if model_input.shape[0] == 1:
+        preds = np.concatenate([session.inner_session.run(None, {model_input.name: x[np.newaxis]})[0] for x in inputs])
+    else:
+        preds = session.inner_session.run(None, {model_input.name: inputs})[0]
 
-def process_with_rembg(image, model='u2net'):
-    return rembg_remove(image, session=rembg_models[model])
+    masks = normalize_masks(np.ascontiguousarray(preds[:, 0], dtype=np.float32))
+    masks = torch.from_numpy(masks).to(inference_device)[:, None].float()
+    masks = upsample_masks(masks, (h, w))[:, 0].round().clamp(0, 255).to(torch.uint8).cpu().numpy()
+    return compose_rgba(frames, masks)
 
 def process_with_carvekit(image, model='u2net'):
     # Initialize segmentation network based on model input
@@ -168,31 +532,21 @@ def process_with_carvekit(image, model='u2net'):
     
     return processed_image
 
-@contextmanager
-def inspyrenet_video_model_context():
-    try:
-        model = Remover()
-        model.model.cuda()
-        yield model
-    finally:
-        model.model.cpu()
-        del model
-        torch.cuda.empty_cache()
-
 @contextmanager
 def carvekit_video_model_context(model_name):
     try:
         if model_name == 'u2net':
-            seg_net = U2NET(device='cuda', batch_size=1)
+            seg_net = U2NET(device='cuda', batch_size=VIDEO_BATCH_SIZE)
         elif model_name == 'tracer':
-            seg_net = TracerUniversalB7(device='cuda', batch_size=1)
+            seg_net = TracerUniversalB7(device='cuda', batch_size=VIDEO_BATCH_SIZE)
         elif model_name == 'basnet':
-            seg_net = BASNET(device='cuda', batch_size=1)
+            seg_net = BASNET(device='cuda', batch_size=VIDEO_BATCH_SIZE)
         elif model_name == 'deeplab':
-            seg_net = DeepLabV3(device='cuda', batch_size=1)
+            seg_net = DeepLabV3(device='cuda', batch_size=VIDEO_BATCH_SIZE)
         else:
             raise ValueError("Unsupported model type")
 
+        # FBA matting runs at 2048px, so only the segmentation net is batched
         fba = FBAMatting(device='cuda', input_tensor_size=2048, batch_size=1)
         trimap = TrimapGenerator()
         preprocessing = PreprocessingStub()
@@ -208,29 +562,42 @@ def carvekit_video_model_context(model_name):
 # Create a global lock for GPU operations
 gpu_lock = asyncio.Lock()
 
+# InSPyReNet stays on the GPU, so requests only need to take turns using it
+inspyrenet_lock = asyncio.Lock()
+
+# Number of video jobs allowed to run inference at the same time
+gpu_job_semaphore = asyncio.Semaphore(int(os.getenv('GPU_JOBS', '1')))
+
+def decode_image(image_data):
+    return Image.open(io.BytesIO(image_data)).convert('RGB')
+
+def encode_png(image):
+    with io.BytesIO() as output:
+        image.save(output, format="PNG")
+        return output.getvalue()
+
 @app.post("/remove_background/")
 async def remove_background(file: UploadFile = File(...), method: str = Form(...)):
     try:
+        loop = asyncio.get_running_loop()
         image_data = await file.read()
-        image = Image.open(io.BytesIO(image_data)).convert('RGB')
+        image = await loop.run_in_executor(cpu_executor, decode_image, image_data)
         
         start_time = time.time()
 
         async def process_image():
             if method == 'bria':
-                return await asyncio.to_thread(process_with_bria, image)
+                result = await asyncio.to_thread(process_with_bria, [np.asarray(image)])
+                return Image.fromarray(result[0], 'RGBA')
             elif method == 'inspyrenet':
-                async with gpu_lock:
-                    try:
-                        inspyrenet_model.model.to('cuda')
-                        result = await asyncio.to_thread(inspyrenet_model.process, image, type='rgba')
-                    finally:
-                        inspyrenet_model.model.to('cpu')
-                    return result
+                async with inspyrenet_lock:
+                    result = await asyncio.to_thread(process_with_inspyrenet, [np.asarray(image)])
+                return Image.fromarray(result[0], 'RGBA')
             elif method in ['u2net_human_seg', 'isnet-general-use', 'isnet-anime']:
-                return await asyncio.to_thread(process_with_rembg, image, model=method)
+                # Single images keep rembg's own resampling and post-processing
+                return await asyncio.to_thread(rembg_remove, image, session=get_rembg_session(method))
             elif method == 'ormbg':
-                return await asyncio.to_thread(process_with_ormbg, image)
+                return (await asyncio.to_thread(process_with_ormbg, [image]))[0]
             elif method in ['u2net', 'tracer', 'basnet', 'deeplab']:
                 async with gpu_lock:
                     try:
@@ -247,12 +614,7 @@ async def remove_background(file: UploadFile = File(...), method: str = Form(...
         process_time = time.time() - start_time
         print(f"Background removal time ({method}): {process_time:.2f} seconds")
         
-        async with gpu_lock:
-            torch.cuda.empty_cache()
-        
-        with io.BytesIO() as output:
-            no_bg_image.save(output, format="PNG")
-            content = output.getvalue()
+        content = await loop.run_in_executor(cpu_executor, encode_png, no_bg_image)
 
         return Response(content=content, media_type="image/png")
 
@@ -260,168 +622,273 @@ async def remove_background(file: UploadFile = File(...), method: str = Form(...
         print(str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_frame(frame_path, method):
-    img = Image.open(frame_path).convert('RGB')
-    
-    if method == 'bria':
-        processed_frame = await asyncio.to_thread(process_with_bria, img)
+async def process_frames(frames, method, model=None, uploader=None):
+    if method == 'inspyrenet':
+        # Only queue the work here, the writer collects the masks once the GPU is done
+        async with inspyrenet_lock:
+            return await asyncio.to_thread(launch_inspyrenet, frames, uploader)
     elif method in ['u2net_human_seg', 'isnet-general-use', 'isnet-anime']:
-        processed_frame = await asyncio.to_thread(process_with_rembg, img, model=method)
+        return await asyncio.to_thread(process_with_rembg, frames, model=method)
+    elif method == 'bria':
+        return await asyncio.to_thread(process_with_bria, frames)
+
+    # The remaining models work on PIL images
+    images = [Image.fromarray(frame) for frame in frames]
+    if method in ['u2net', 'tracer', 'basnet', 'deeplab']:
+        processed_images = await asyncio.to_thread(model, images)
     elif method == 'ormbg':
-        processed_frame = await asyncio.to_thread(process_with_ormbg, img)
+        processed_images = await asyncio.to_thread(process_with_ormbg, images)
     else:
         raise ValueError("Invalid method")
     
-    return processed_frame
+    return np.stack([np.asarray(image.convert('RGBA')) for image in processed_images])
+
+async def set_status(video_id, status):
+    async with status_lock:
+        processing_status[video_id] = status
+
+async def probe_video(video_path):
+    # Everything comes from the container metadata, so ffprobe never has to demux the whole file
+    probe_command = ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                     '-show_entries', 'stream=width,height,nb_frames,duration,r_frame_rate'
+                                      ':stream_tags=rotate:stream_side_data=rotation:format=duration',
+                     '-of', 'json', video_path]
+    process = await asyncio.create_subprocess_exec(
+        *probe_command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"Error probing video: {stderr.decode()}")
+
+    try:
+        probe = json.loads(stdout)
+    except ValueError:
+        raise RuntimeError(f"Unreadable ffprobe output for {video_path}")
+    streams = probe.get('streams') or []
+    if not streams:
+        raise RuntimeError(f"No video stream found in {video_path}")
+    stream = streams[0]
+    if not stream.get('width') or not stream.get('height'):
+        raise RuntimeError(f"Video stream in {video_path} has no frame size")
+    width, height = stream['width'], stream['height']
+    # ffmpeg auto-rotates decoded frames, so portrait phone videos come out transposed
+    rotation = int(stream.get('tags', {}).get('rotate', 0))
+    for side_data in stream.get('side_data_list', []):
+        rotation = int(side_data.get('rotation', rotation))
+    if rotation % 180 != 0:
+        width, height = height, width
+
+    fps = stream.get('r_frame_rate', '24/1')
+    try:
+        valid_fps = Fraction(fps) > 0
+    except (ValueError, ZeroDivisionError):
+        valid_fps = False
+    if not valid_fps:
+        # Some streams report 0/0, which the encoder would reject
+        fps = '24/1'
+    if str(stream.get('nb_frames', '')).isdigit():
+        frame_count = int(stream['nb_frames'])
+    else:
+        # Containers like webm don't store a frame count, estimate it from the duration
+        duration = stream.get('duration', probe.get('format', {}).get('duration', 'N/A'))
+        try:
+            frame_count = round(float(duration) * float(Fraction(fps)))
+        except (ValueError, ZeroDivisionError):
+            frame_count = 0
+
+    return {'width': width, 'height': height, 'fps': fps, 'frame_count': frame_count}
+
+async def read_frame(stream, width, height):
+    try:
+        data = await stream.readexactly(width * height * 3)
+    except asyncio.IncompleteReadError:
+        return None
+    return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
 
 async def process_video(video_path, method, video_id):
+    decoder = encoder = output_path = None
+    decoder_stderr = encoder_stderr = None
     try:
-        processing_status[video_id] = {'status': 'processing', 'progress': 0, 'message': 'Initializing'}
+        await set_status(video_id, {'status': 'processing', 'progress': 0, 'message': 'Initializing'})
         
         logger.info(f"Starting video processing: {video_path}")
         logger.info(f"Method: {method}")
         logger.info(f"Video ID: {video_id}")
 
 
-        # Check video frame count
-        frame_count_command = ['ffmpeg.ffprobe', '-v', 'error', '-select_streams', 'v:0', '-count_packets', 
-                               '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', video_path]
-        process = await asyncio.create_subprocess_exec(
-            *frame_count_command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
-        
-        if process.returncode != 0:
-            logger.error(f"Error counting frames: {stderr.decode()}")
-            processing_status[video_id] = {'status': 'error', 'message': 'Error counting frames'}
+        # Probe frame size, rate and count once, the pipeline below reuses them
+        try:
+            video_info = await probe_video(video_path)
+        except RuntimeError as e:
+            logger.error(str(e))
+            await set_status(video_id, {'status': 'error', 'message': 'Error probing video'})
             return
 
-        frame_count = int(stdout.decode().strip())
+        width, height = video_info['width'], video_info['height']
+        frame_count = video_info['frame_count']
         logger.info(f"Video frame count: {frame_count}")
+        logger.info(f"Video frame size: {width}x{height} at {video_info['fps']} fps")
 
         #DISABLED VIDEO LENGTH LIMIT
         #if frame_count > 250:
         #    logger.warning(f"Video too long: {frame_count} frames")
-        #    processing_status[video_id] = {'status': 'error', 'message': 'Video too long (max 250 frames)'}
+        #    await set_status(video_id, {'status': 'error', 'message': 'Video too long (max 250 frames)'})
         #    return
 
-        # Create a unique directory for this video's frames
-        frames_dir = os.path.join(FRAMES_DIR, video_id)
-        os.makedirs(frames_dir, exist_ok=True)
-        logger.info(f"Created frames directory: {frames_dir}")
-
-        # Extract frames from video
-        processing_status[video_id] = {'status': 'processing', 'progress': 0, 'message': 'Extracting frames'}
-        extract_command = ['ffmpeg', '-i', video_path, f'{frames_dir}/frame_%05d.png']
-        logger.info(f"Executing frame extraction command: {' '.join(extract_command)}")
-        process = await asyncio.create_subprocess_exec(
-            *extract_command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
-        
-        if process.returncode != 0:
-            logger.error(f"Error extracting frames: {stderr.decode()}")
-            processing_status[video_id] = {'status': 'error', 'message': 'Error extracting frames'}
+        # Only GPU_JOBS videos hold the models at once, the rest wait here as 'queued'
+        await set_status(video_id, {'status': 'queued', 'progress': 0, 'message': 'Waiting for a free GPU slot'})
+        async with gpu_job_semaphore:
+            # Stream raw RGB frames out of one ffmpeg process and RGBA frames into another
+            output_path = os.path.join(TEMP_VIDEOS_DIR, f"output_{video_id}.webm")
+            decode_command = ['ffmpeg', '-v', 'error']
+            if FFMPEG_HWACCEL:
+                decode_command += ['-hwaccel', FFMPEG_HWACCEL]
+            decode_command += [
+                '-i', video_path,
+                '-f', 'rawvideo',
+                '-pix_fmt', 'rgb24',
+                'pipe:1'
+            ]
+            encode_command = [
+                'ffmpeg', '-v', 'error', '-y',
+                '-f', 'rawvideo',
+                '-pix_fmt', 'rgba',
+                '-s', f'{width}x{height}',
+                '-framerate', video_info['fps'],
+                '-i', 'pipe:0',
+                *VIDEO_ENCODE_PRESETS[VIDEO_ENCODE_PRESET],
+                '-pix_fmt', 'yuva420p',
+                '-threads', str(FFMPEG_THREADS),
+                output_path
+            ]
+            logger.info(f"Executing frame decode command: {' '.join(decode_command)}")
+            decoder = await asyncio.create_subprocess_exec(
+                *decode_command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=max(FFMPEG_PIPE_BUFSIZE, width * height * 3)
+            )
+            # Drain stderr while the job runs so a chatty ffmpeg never blocks on a full pipe
+            decoder_stderr = asyncio.create_task(decoder.stderr.read())
+            logger.info(f"Executing video encode command: {' '.join(encode_command)}")
+            encoder = await asyncio.create_subprocess_exec(
+                *encode_command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+            encoder_stderr = asyncio.create_task(encoder.stderr.read())
+
+            # Initialize the model once, outside the batch processing loop
+            if method in ['u2net', 'tracer', 'basnet', 'deeplab']:
+                model_context = carvekit_video_model_context(method)
+                model = model_context.__enter__()
+            else:
+                model = None  # For other methods that don't require a specific model
+
+            # Pinned staging buffers are reused across this job's batches and never shared with other jobs
+            uploader = PinnedUploader() if method == 'inspyrenet' and inference_device == 'cuda' else None
+
+            # Decode, inference and encode run concurrently, connected by bounded queues
+            frame_queue = asyncio.Queue(maxsize=VIDEO_BATCH_SIZE * 2)
+            result_queue = asyncio.Queue(maxsize=2)
+            processed_count = 0
+
+            async def reader():
+                while True:
+                    frame = await read_frame(decoder.stdout, width, height)
+                    await frame_queue.put(frame)
+                    if frame is None:
+                        return
+
+            async def worker():
+                finished = False
+                while not finished:
+                    frames = []
+                    while len(frames) < VIDEO_BATCH_SIZE:
+                        frame = await frame_queue.get()
+                        if frame is None:
+                            finished = True
+                            break
+                        frames.append(frame)
+                    if frames:
+                        await result_queue.put(await process_frames(frames, method, model, uploader))
+                await result_queue.put(None)
+
+            async def writer():
+                nonlocal processed_count
+                while (processed_frames := await result_queue.get()) is not None:
+                    if isinstance(processed_frames, PendingMasks):
+                        processed_frames = await asyncio.to_thread(processed_frames.result)
+                    # The whole batch goes to the encoder in one write, without an extra bytes copy
+                    encoder.stdin.write(memoryview(processed_frames).cast('B'))
+                    await encoder.stdin.drain()
+
+                    processed_count += len(processed_frames)
+                    progress = min(processed_count / frame_count * 100, 100) if frame_count else 0
+                    await set_status(video_id, {'status': 'processing', 'progress': progress})
+
+            await set_status(video_id, {'status': 'processing', 'progress': 0, 'message': 'Removing background'})
+            tasks = [asyncio.create_task(stage()) for stage in (reader, worker, writer)]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # A failed stage must not leave the others blocked on their queues
+                for task in tasks:
+                    task.cancel()
+
+                # Ensure we clean up the model context
+                if method in ['u2net', 'tracer', 'basnet', 'deeplab']:
+                    model_context.__exit__(None, None, None)
+
+        logger.info(f"Number of processed frames: {processed_count}")
+        await decoder.wait()
+        if decoder.returncode != 0:
+            logger.error(f"Error decoding frames: {(await decoder_stderr).decode()}")
+            await set_status(video_id, {'status': 'error', 'message': 'Error decoding frames'})
             return
 
-        # Process frames
-        processing_status[video_id] = {'status': 'processing', 'progress': 0, 'message': 'Removing background'}
-        frame_files = sorted([f for f in os.listdir(frames_dir) if f.endswith('.png')])
-        total_frames = len(frame_files)
-        logger.info(f"Number of extracted frames: {total_frames}")
-
-        if total_frames == 0:
-            logger.error("No frames were extracted from the video")
-            processing_status[video_id] = {'status': 'error', 'message': 'No frames were extracted from the video'}
+        if processed_count == 0:
+            logger.error("No frames were decoded from the video")
+            await set_status(video_id, {'status': 'error', 'message': 'No frames were decoded from the video'})
             return
 
-        # Initialize the model once, outside the batch processing loop
-        if method == 'inspyrenet':
-            print("start init")
-            model_context = inspyrenet_video_model_context()
-            print("start enter")
-            model = model_context.__enter__()
-            print("finish enter")
-        elif method in ['u2net', 'tracer', 'basnet', 'deeplab']:
-            model_context = carvekit_video_model_context(method)
-            model = model_context.__enter__()
-        else:
-            model = None  # For other methods that don't require a specific model
-
-        try:
-            async def process_frame_batch(start_idx, end_idx):
-                for i in range(start_idx, min(end_idx, total_frames)):
-                    frame_file = frame_files[i]
-                    frame_path = os.path.join(frames_dir, frame_file)
-                    img = Image.open(frame_path).convert('RGB')
-
-                    if method == 'inspyrenet':
-                        processed_frame = model.process(img, type='rgba')
-                    elif method in ['u2net', 'tracer', 'basnet', 'deeplab']:
-                        processed_frame = model([img])[0]
-                    else:
-                        processed_frame = await process_frame(frame_path, method)
-
-                    processed_frame.save(frame_path, format='PNG')
-                    progress = (i + 1) / total_frames * 100
-                    processing_status[video_id] = {'status': 'processing', 'progress': progress}
-
-            batch_size = 3
-            for i in range(0, total_frames, batch_size):
-                await process_frame_batch(i, i + batch_size)
-                await asyncio.sleep(0)  # Allow other tasks to run
-
-        finally:
-            # Ensure we clean up the model context
-            if method in ['inspyrenet', 'u2net', 'tracer', 'basnet', 'deeplab']:
-                model_context.__exit__(None, None, None)
-
-        # Create output video
-        processing_status[video_id] = {'status': 'processing', 'progress': 100, 'message': 'Encoding video'}
-        output_path = os.path.join(TEMP_VIDEOS_DIR, f"output_{video_id}.webm")
-        create_video_command = [
-            'ffmpeg',
-            '-framerate', '24',
-            '-i', f'{frames_dir}/frame_%05d.png',
-            '-c:v', 'libvpx-vp9',
-            '-pix_fmt', 'yuva420p',
-            '-lossless', '1',
-            output_path
-        ]
-        logger.info(f"Executing video creation command: {' '.join(create_video_command)}")
-        process = await asyncio.create_subprocess_exec(
-            *create_video_command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
-        
-        if process.returncode != 0:
-            logger.error(f"Error creating output video: {stderr.decode()}")
-            processing_status[video_id] = {'status': 'error', 'message': 'Error creating output video'}
+        # Finish output video
+        await set_status(video_id, {'status': 'processing', 'progress': 100, 'message': 'Encoding video'})
+        encoder.stdin.close()
+        await encoder.wait()
+        if encoder.returncode != 0:
+            logger.error(f"Error creating output video: {(await encoder_stderr).decode()}")
+            await set_status(video_id, {'status': 'error', 'message': 'Error creating output video'})
             return
 
         logger.info(f"Video processing completed. Output path: {output_path}")
-        processing_status[video_id] = {'status': 'completed', 'output_path': output_path}
+        await set_status(video_id, {'status': 'completed', 'output_path': output_path})
 
     except Exception as e:
         logger.exception("Error in video processing")
-        processing_status[video_id] = {'status': 'error', 'message': str(e)}
+        await set_status(video_id, {'status': 'error', 'message': str(e)})
     finally:
-        torch.cuda.empty_cache()
-
-        # Clean up frames directory
-        for file in os.listdir(frames_dir):
-            os.remove(os.path.join(frames_dir, file))
-        os.rmdir(frames_dir)
-        logger.info(f"Cleaned up frames directory: {frames_dir}")
+        # Make sure no ffmpeg process outlives the job
+        for process in (decoder, encoder):
+            if process is not None and process.returncode is None:
+                process.kill()
+                await process.wait()
+        for task in (decoder_stderr, encoder_stderr):
+            if task is not None:
+                task.cancel()
+
+        # The input and any completed or partial output expire once the job is over,
+        # however long it waited for a GPU slot
+        schedule_cleanup(video_path)
+        if output_path is not None:
+            schedule_cleanup(output_path)
 
 @app.post("/remove_background_video/")
 async def remove_background_video(background_tasks: BackgroundTasks, file: UploadFile = File(...), method: str = Form(...)):
+    file_path = None
     try:
         logger.info(f"Starting video background removal with method: {method}")
         
@@ -430,10 +897,12 @@ async def remove_background_video(background_tasks: BackgroundTasks, file: Uploa
         filename = f"input_{video_id}.mp4"
         file_path = os.path.join(TEMP_VIDEOS_DIR, filename)
         
-        # Save uploaded video to the temp_videos folder
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream the upload to the temp_videos folder in a worker thread, one chunk at a time
+        def save_upload():
+            with open(file_path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer, UPLOAD_CHUNK_SIZE)
+
+        await asyncio.to_thread(save_upload)
 
         logger.info(f"Video file saved: {file_path}")
         logger.info(f"File exists: {os.path.exists(file_path)}")
@@ -449,27 +918,42 @@ async def remove_background_video(background_tasks: BackgroundTasks, file: Uploa
 
     except Exception as e:
         logger.exception(f"Error in video processing: {str(e)}")
+        # The job never started, so nothing else will clean up a partial upload
+        if file_path is not None and os.path.exists(file_path):
+            schedule_cleanup(file_path)
         raise HTTPException(status_code=500, detail=f"Error in video processing: {str(e)}")
 
+class VideoFileResponse(FileResponse):
+    # Read and send rendered videos in 1 MiB chunks instead of starlette's 64 KiB default
+    chunk_size = 1 << 20
+
 @app.get("/status/{video_id}")
-async def get_status(video_id: str):
-    if video_id not in processing_status:
+async def get_status(video_id: str, request: Request):
+    async with status_lock:
+        status = processing_status.get(video_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="Video ID not found")
     
-    status = processing_status[video_id]
-    
     if status['status'] == 'completed':
         output_path = status['output_path']
         if not os.path.exists(output_path):
             raise HTTPException(status_code=404, detail="Processed video file not found")
         
-        return FileResponse(output_path, media_type="video/webm", filename=f"processed_video_{video_id}.webm")
+        # Each video ID maps to exactly one rendered output, so repeat downloads can be served from cache
+        etag = f'"{video_id}"'
+        headers = {'ETag': etag, 'Cache-Control': f'private, max-age={TEMP_FILE_TTL}'}
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers=headers)
+
+        return VideoFileResponse(output_path, media_type="video/webm", filename=f"processed_video_{video_id}.webm",
+                                 headers=headers)
     
     return status
 
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(cleanup_old_videos())
+    # The event loop only keeps weak references to tasks
+    app.state.cleanup_task = asyncio.create_task(cleanup_old_videos())
     
 
 
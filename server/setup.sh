@@ -14,8 +14,10 @@ source venv/bin/activate
 # Install Python dependencies
 pip install numpy==1.26.4 #WEIRD IMPORT ERROR WORKAROUND FOR REMBG
 pip install torch torchvision torchaudio --index-url https://download.pytorch.org/whl/cu121
-pip install fastapi uvicorn transformers pillow scikit-image transparent-background rembg opencv-python-headless python-multipart requests
+pip install fastapi uvicorn transformers pillow scikit-image transparent-background rembg opencv-python-headless python-multipart requests numba cachetools
 pip install carvekit #--extra-index-url https://download.pytorch.org/whl/cu121
+#pip uninstall -y onnxruntime && pip install "rembg[gpu]" #OPTIONAL: onnxruntime-gpu, required for the CUDA/TensorRT providers used by rembg
+#pip install tensorrt #OPTIONAL: FP16 TensorRT engines for InSPyReNet and rembg (cached in TENSORRT_CACHE_DIR)
 
 # Ensure stuff is in the PATH
 echo 'export PATH=$PATH:$HOME/.local/bin' >> ~/.bashrc
@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import os
+
+import tensorrt as trt
+import torch
+
+logger = logging.getLogger(__name__)
+
+TRT_LOGGER = trt.Logger(trt.Logger.WARNING)
+
+
+def weights_fingerprint(model):
+    """Cheap digest of a model's state dict, so swapping checkpoints invalidates cached engines."""
+    state = model.state_dict()
+    digest = hashlib.sha1()
+    for name, tensor in state.items():
+        digest.update(f"{name}:{tuple(tensor.shape)}:{tensor.dtype}".encode())
+    with torch.no_grad():
+        sums = torch.stack([tensor.detach().double().sum() for tensor in state.values()])
+    digest.update(sums.cpu().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def export_onnx(model, onnx_path, sample_input):
+    model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            sample_input,
+            onnx_path,
+            input_names=['input'],
+            output_names=['output'],
+            dynamic_axes={
+                'input': {0: 'batch', 2: 'height', 3: 'width'},
+                'output': {0: 'batch', 2: 'height', 3: 'width'},
+            },
+            opset_version=17,
+        )
+
+
+def build_engine(onnx_path, min_shape, opt_shape, max_shape, fp16=True):
+    builder = trt.Builder(TRT_LOGGER)
+    network = builder.create_network(1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH))
+    parser = trt.OnnxParser(network, TRT_LOGGER)
+    with open(onnx_path, 'rb') as f:
+        if not parser.parse(f.read()):
+            errors = [str(parser.get_error(i)) for i in range(parser.num_errors)]
+            raise RuntimeError(f"Failed to parse ONNX model {onnx_path}: {errors}")
+
+    config = builder.create_builder_config()
+    if fp16 and builder.platform_has_fast_fp16:
+        config.set_flag(trt.BuilderFlag.FP16)
+
+    profile = builder.create_optimization_profile()
+    profile.set_shape(network.get_input(0).name, min_shape, opt_shape, max_shape)
+    config.add_optimization_profile(profile)
+
+    engine_bytes = builder.build_serialized_network(network, config)
+    if engine_bytes is None:
+        raise RuntimeError(f"Failed to build TensorRT engine from {onnx_path}")
+    return engine_bytes
+
+
+class TRTRunner:
+    """Runs a serialized TensorRT engine with a single input and a single output."""
+
+    def __init__(self, engine_bytes):
+        self.runtime = trt.Runtime(TRT_LOGGER)
+        self.engine = self.runtime.deserialize_cuda_engine(engine_bytes)
+        self.context = self.engine.create_execution_context()
+        names = [self.engine.get_tensor_name(i) for i in range(self.engine.num_io_tensors)]
+        self.input_name = next(n for n in names if self.engine.get_tensor_mode(n) == trt.TensorIOMode.INPUT)
+        self.output_name = next(n for n in names if self.engine.get_tensor_mode(n) == trt.TensorIOMode.OUTPUT)
+
+    @classmethod
+    def from_model(cls, model, name, cache_dir, min_shape, opt_shape, max_shape, fp16=True):
+        """Loads a cached engine for `model`, exporting and building it on a cache miss.
+
+        Engines are keyed by the model weights, the optimization profile shapes
+        and the TensorRT version, so changing any of them triggers a rebuild.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        key = f"{name}:{weights_fingerprint(model)}:{min_shape}:{opt_shape}:{max_shape}:{fp16}:{trt.__version__}"
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        engine_path = os.path.join(cache_dir, f"{name}_{digest}.engine")
+
+        if os.path.exists(engine_path):
+            logger.info(f"Loading cached TensorRT engine: {engine_path}")
+            with open(engine_path, 'rb') as f:
+                return cls(f.read())
+
+        onnx_path = os.path.join(cache_dir, f"{name}_{digest}.onnx")
+        logger.info(f"Exporting {name} to ONNX: {onnx_path}")
+        device = next(model.parameters()).device
+        export_onnx(model, onnx_path, torch.randn((1, *opt_shape[1:]), device=device))
+
+        logger.info(f"Building TensorRT engine: {engine_path}")
+        engine_bytes = build_engine(onnx_path, min_shape, opt_shape, max_shape, fp16=fp16)
+        with open(engine_path, 'wb') as f:
+            f.write(engine_bytes)
+        os.remove(onnx_path)
+        return cls(engine_bytes)
+
+    def __call__(self, tensor):
+        tensor = tensor.to('cuda', torch.float32).contiguous()
+        if not self.context.set_input_shape(self.input_name, tuple(tensor.shape)):
+            raise RuntimeError(f"Input shape {tuple(tensor.shape)} is outside the engine's optimization profile")
+        output_shape = tuple(self.context.get_tensor_shape(self.output_name))
+        if any(dim < 0 for dim in output_shape):
+            raise RuntimeError(f"Could not resolve the output shape for input shape {tuple(tensor.shape)}")
+        output = torch.empty(output_shape, dtype=torch.float32, device=tensor.device)
+        self.context.set_tensor_address(self.input_name, tensor.data_ptr())
+        self.context.set_tensor_address(self.output_name, output.data_ptr())
+        if not self.context.execute_async_v3(torch.cuda.current_stream().cuda_stream):
+            raise RuntimeError("TensorRT failed to enqueue inference")
+        return output
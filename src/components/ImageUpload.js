@@ -216,7 +216,7 @@ const ImageUpload = ({ onProcessed, fileID, selectedModels, showErrorToast }) =>
       if (contentType && contentType.indexOf('application/json') !== -1) {
         // It's a JSON response (status update)
         const data = await response.data.text().then(JSON.parse);
-        if (data.status === 'processing') {
+        if (data.status === 'processing' || data.status === 'queued') {
           setVideoProgress(data.progress);
           setStatusMessage(data.message);
           setTimeout(() => pollVideoStatus(id, url), 4000); // Poll every second